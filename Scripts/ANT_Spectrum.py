@@ -87,9 +87,21 @@ def main():
     parser.add_argument("--averaging", type=int, default=8, help="Number of averages")
     args = parser.parse_args()
 
-    context = zmq.Context()
+    context = zmq.Context.instance()
+    context.set(zmq.IO_THREADS, 2)
     socket = context.socket(zmq.PUB)
-    socket.bind(f"tcp://{args.zmq_host}:{args.zmq_port}")
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.setsockopt(zmq.SNDHWM, 10000)
+    socket.setsockopt(zmq.TCP_KEEPALIVE, 1)
+    socket.setsockopt(zmq.TCP_KEEPALIVE_IDLE, 60)
+    socket.setsockopt(zmq.TCP_KEEPALIVE_INTVL, 10)
+    try:
+        socket.bind(f"tcp://{args.zmq_host}:{args.zmq_port}")
+    except zmq.ZMQError as e:
+        if e.errno != zmq.EADDRINUSE:
+            raise
+        context.destroy()
+        sys.exit(f"ZMQ port {args.zmq_port} already in use: {e}")
 
     analyzer = ANTSDRSpectrumAnalyzer(
         args.uri, 
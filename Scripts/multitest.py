@@ -527,9 +527,16 @@ class DroneMessageGenerator:
 				return message
 	
 def setup_zmq():
-	context = zmq.Context()
+	context = zmq.Context.instance()
+	context.set(zmq.IO_THREADS, 2)
 	cot_socket = context.socket(zmq.PUB)
 	status_socket = context.socket(zmq.PUB)
+	for sock in (cot_socket, status_socket):
+		sock.setsockopt(zmq.LINGER, 0)
+		sock.setsockopt(zmq.SNDHWM, 10000)
+		sock.setsockopt(zmq.TCP_KEEPALIVE, 1)
+		sock.setsockopt(zmq.TCP_KEEPALIVE_IDLE, 60)
+		sock.setsockopt(zmq.TCP_KEEPALIVE_INTVL, 10)
 	return context, cot_socket, status_socket
 
 def clear_screen():
@@ -626,8 +633,16 @@ def main_menu():
 			else:
 				# Setup ZMQ
 				context, cot_sock, status_sock = setup_zmq()
-				cot_sock.bind(f"tcp://{config.zmq_host}:{config.cot_port}")
-				status_sock.bind(f"tcp://{config.zmq_host}:{config.status_port}")
+				try:
+					cot_sock.bind(f"tcp://{config.zmq_host}:{config.cot_port}")
+					status_sock.bind(f"tcp://{config.zmq_host}:{config.status_port}")
+				except zmq.ZMQError as e:
+					if e.errno != zmq.EADDRINUSE:
+						raise
+					print(f"\n❌ Address already in use: {e}")
+					context.destroy()
+					input("\nPress Enter to return to menu...")
+					continue
 				
 			clear_screen()
 			print(f"🚀 Broadcasting messages every {interval} seconds via {config.broadcast_mode}")
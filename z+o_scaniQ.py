@@ -1,40 +1,129 @@
 
+import os
 import numpy as np
 import zmq
 import time
 import datetime
 import threading
+import queue
 
 # === CONFIG === #
 FREQ_LIST = list(range(870_000_000, 928_000_001, 3_000_000))
 SAMPLE_RATE = 2_500_000
 THRESHOLD_DB = -45
 RECORD_SEC = 5
+CHUNK_SAMPLES = 1 << 20
+POOL_SLOTS = 4
+MAX_STREAM_ERRORS = 10
 PATTERN_HEX = 0xF17C1599
-PATTERN_BITS = np.unpackbits(np.array(list(PATTERN_HEX.to_bytes(4, 'big')), dtype=np.uint8))
+PATTERN_BYTES = PATTERN_HEX.to_bytes(4, 'big')
+PATTERN_BITS = np.unpackbits(np.frombuffer(PATTERN_BYTES, dtype=np.uint8))
 ZMQ_ADDRESS = "tcp://127.0.0.1:5556"
 STATION_LAT = 50.4501
 STATION_LON = 30.5234
 DRIVER = "plutosdr"  
 
 # === ZMQ INIT ===#
-ctx = zmq.Context()
+ctx = zmq.Context.instance()
+ctx.set(zmq.IO_THREADS, 2)
 sock = ctx.socket(zmq.PUB)
+sock.setsockopt(zmq.SNDHWM, 10000)
+sock.setsockopt(zmq.SNDBUF, 4 * 1024 * 1024)
+# Queued detections survive reconnects; give them a bounded window to flush on exit
+sock.setsockopt(zmq.LINGER, 2000)
+sock.setsockopt(zmq.TCP_KEEPALIVE, 1)
+sock.setsockopt(zmq.TCP_KEEPALIVE_IDLE, 60)
+sock.setsockopt(zmq.TCP_KEEPALIVE_INTVL, 10)
 sock.connect(ZMQ_ADDRESS)
 
 # === DETECT PATTERN === #
 def detect_pattern(samples):
-    angle_diff = np.angle(samples[1:] * np.conj(samples[:-1]))
-    bits = (angle_diff > 0).astype(np.uint8)
-    bits_str = ''.join(map(str, bits))
-    pattern_str = ''.join(map(str, PATTERN_BITS))
-    return pattern_str in bits_str
+    # angle(a * conj(b)) > 0 exactly when its imaginary part is positive
+    a = samples[1:]
+    b = samples[:-1]
+    bits = ((a.imag * b.real - a.real * b.imag) > 0).astype(np.uint8)
+    # Pack each of the 8 bit alignments to bytes so the search runs in C
+    for shift in range(8):
+        usable = (len(bits) - shift) // 8 * 8
+        if usable < len(PATTERN_BITS):
+            break
+        if PATTERN_BYTES in np.packbits(bits[shift:shift + usable]).tobytes():
+            return True
+    return False
 
 # === LOG === #
 def log(msg):
     now = datetime.datetime.utcnow().strftime("%H:%M:%S")
     print(f"[{now}] {msg}")
 
+# === CU8 === #
+def to_cu8(samples, scratch, out):
+    """Scale CF32 I/Q in [-1, 1] to interleaved unsigned 8-bit; returns a view of out.
+
+    Unity scaling keeps full scale but costs precision: a signal just above
+    THRESHOLD_DB (-45 dBFS) is under one LSB RMS, so weak detections are
+    recorded as little more than quantization noise.
+    """
+    iq = samples.view(np.float32)
+    tmp = scratch[:len(iq)]
+    np.multiply(iq, 127.5, out=tmp)
+    np.add(tmp, 127.5, out=tmp)
+    # Round rather than truncate so decoding with (v - 127.5) / 127.5 has no DC offset
+    np.rint(tmp, out=tmp)
+    np.clip(tmp, 0, 255, out=tmp)
+    dst = out[:len(iq)]
+    np.copyto(dst, tmp, casting='unsafe')
+    return dst
+
+# === CAPTURE === #
+def capture(sdr, stream, samples_total, pool, filled):
+    """Fill pooled chunks from readStream and hand them to the consumer.
+
+    An exception raised here is queued for the consumer; None always marks the end.
+    """
+    slot = None
+    try:
+        from SoapySDR import SOAPY_SDR_OVERFLOW, errToStr
+
+        # Real-time priority for this thread only; SCHED_FIFO needs CAP_SYS_NICE (or root)
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(10))
+        except (AttributeError, OSError):
+            try:
+                os.nice(-10)
+            except OSError:
+                pass
+        idx = 0
+        errors = 0
+        while idx < samples_total and errors < MAX_STREAM_ERRORS:
+            slot = pool.get()
+            want = min(len(slot), samples_total - idx)
+            n = 0
+            while n < want:
+                sr = sdr.readStream(stream, [slot[n:want]], want - n)
+                if sr.ret > 0:
+                    n += sr.ret
+                    errors = 0
+                    continue
+                if sr.ret == SOAPY_SDR_OVERFLOW:
+                    log(f"[CAPTURE] Overflow at sample {idx + n}, recording has a gap")
+                elif sr.ret < 0:
+                    log(f"[CAPTURE] readStream error: {errToStr(sr.ret)}")
+                errors += 1
+                if errors >= MAX_STREAM_ERRORS:
+                    log(f"[CAPTURE] {errors} consecutive stream errors, stopping at {idx + n} samples")
+                    break
+            filled.put((slot, n))
+            slot = None
+            idx += n
+    except Exception as e:
+        # Hand back a slot we took but never queued so the pool keeps its size
+        if slot is not None:
+            pool.put(slot)
+        filled.put(e)
+    finally:
+        filled.put(None)
+
 # === MAIN === #
 def scan_loop():
     import SoapySDR
@@ -46,55 +135,92 @@ def scan_loop():
     sdr.setGain(SOAPY_SDR_RX, 0, 40)
     stream = sdr.setupStream(SOAPY_SDR_RX, SOAPY_SDR_CF32)
 
+    pool = queue.SimpleQueue()
+    for _ in range(POOL_SLOTS):
+        pool.put(np.empty(CHUNK_SAMPLES, dtype=np.complex64))
+    cu8_scratch = np.empty(2 * CHUNK_SAMPLES, dtype=np.float32)
+    cu8_out = np.empty(2 * CHUNK_SAMPLES, dtype=np.uint8)
+
     log("Scanning...")
-    for freq in FREQ_LIST:
-        log(f"[SCAN] {freq/1e6:.1f} MHz")
-        sdr.setFrequency(SOAPY_SDR_RX, 0, freq)
-        sdr.activateStream(stream)
-
-        buff = np.array([0]*1024, np.complex64)
-        sr = sdr.readStream(stream, [buff], len(buff))
-        log(f"  sr.ret = {sr.ret}")
-
-        if sr.ret > 0:
-            power_db = 10 * np.log10(np.mean(np.abs(buff[:sr.ret])**2) + 1e-12)
-            if power_db > THRESHOLD_DB:
-                now = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-                fname = f"iq_{int(freq/1e6)}MHz_{now}.cu8"
-                samples_total = int(RECORD_SEC * SAMPLE_RATE)
-                recorded = np.zeros(samples_total, dtype=np.complex64)
-
-                idx = 0
-                while idx < samples_total:
-                    sr = sdr.readStream(stream, [buff], len(buff))
-                    if sr.ret > 0:
-                        recorded[idx:idx+sr.ret] = buff[:sr.ret]
-                        idx += sr.ret
-
-                recorded.tofile(fname)
-                log(f"[SAVE] {fname}")
-
-                pattern_found = detect_pattern(recorded[:4096])
-                if pattern_found:
-                    log("[MATCH] Signature 0xF17C1599 found")
-
-                payload = {
-                    "type": "signal_detected",
-                    "freq": freq,
-                    "rssi": round(power_db, 2),
-                    "timestamp": now,
-                    "pattern": pattern_found,
-                    "lat": STATION_LAT,
-                    "lon": STATION_LON
-                }
-                sock.send_json(payload)
-
-                with open("cav.log", "a") as logf:
-                    log_line = f"{now} | {freq/1e6:.1f} MHz | {power_db:.2f} dB | pattern={pattern_found} | lat={STATION_LAT} | lon={STATION_LON}\n"
-                    logf.write(log_line)
-
-        sdr.deactivateStream(stream)
-        time.sleep(1)
+    logf = open("cav.log", "a", buffering=1)
+    try:
+        for freq in FREQ_LIST:
+            log(f"[SCAN] {freq/1e6:.1f} MHz")
+            sdr.setFrequency(SOAPY_SDR_RX, 0, freq)
+            sdr.activateStream(stream)
+
+            buff = np.empty(1024, dtype=np.complex64)
+            sr = sdr.readStream(stream, [buff], len(buff))
+            log(f"  sr.ret = {sr.ret}")
+
+            if sr.ret > 0:
+                power = float(np.vdot(buff[:sr.ret], buff[:sr.ret]).real) / sr.ret
+                power_db = 10 * np.log10(power + 1e-12)
+                if power_db > THRESHOLD_DB:
+                    now = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+                    fname = f"iq_{int(freq/1e6)}MHz_{now}.cu8"
+                    samples_total = int(RECORD_SEC * SAMPLE_RATE)
+
+                    # Capture on a producer thread so file writes overlap readStream
+                    filled = queue.SimpleQueue()
+                    producer = threading.Thread(
+                        target=capture,
+                        args=(sdr, stream, samples_total, pool, filled),
+                        daemon=True
+                    )
+                    producer.start()
+
+                    head = None
+                    captured = 0
+                    capture_error = None
+                    with open(fname, "wb") as iqf:
+                        while True:
+                            item = filled.get()
+                            if item is None:
+                                break
+                            if isinstance(item, Exception):
+                                capture_error = item
+                                continue
+                            slot, n = item
+                            if head is None:
+                                head = slot[:min(n, 4096)].copy()
+                            iqf.write(to_cu8(slot[:n], cu8_scratch, cu8_out))
+                            captured += n
+                            pool.put(slot)
+                    producer.join()
+
+                    if capture_error is not None:
+                        log(f"[CAPTURE] Failed: {capture_error!r}; {fname} not published")
+                    else:
+                        truncated = captured < samples_total
+                        if truncated:
+                            log(f"[SAVE] {fname} (truncated: {captured} of {samples_total} samples)")
+                        else:
+                            log(f"[SAVE] {fname}")
+
+                        pattern_found = detect_pattern(head)
+                        if pattern_found:
+                            log("[MATCH] Signature 0xF17C1599 found")
+
+                        payload = {
+                            "type": "signal_detected",
+                            "freq": freq,
+                            "rssi": round(power_db, 2),
+                            "timestamp": now,
+                            "pattern": pattern_found,
+                            "truncated": truncated,
+                            "lat": STATION_LAT,
+                            "lon": STATION_LON
+                        }
+                        sock.send_json(payload)
+
+                        log_line = f"{now} | {freq/1e6:.1f} MHz | {power_db:.2f} dB | pattern={pattern_found} | truncated={truncated} | lat={STATION_LAT} | lon={STATION_LON}\n"
+                        logf.write(log_line)
+
+            sdr.deactivateStream(stream)
+            time.sleep(1)
+    finally:
+        logf.close()
 
     log("Scan complete.")
 